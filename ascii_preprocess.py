@@ -20,48 +20,103 @@ import struct
 import sys
 import os
 import shutil
+import hashlib
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
 from PIL import Image
 
+try:
+    import fcntl  # POSIX only; on Windows the counter file is used unlocked
+except ImportError:
+    fcntl = None
+
 BACKUP_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "blob_backup")
 
-def backup_blob(output_path):
+# Header: cols, rows (u16 LE); compiled once for all writes
+_HEADER = struct.Struct("<HH")
+
+def file_digest(path):
+    """BLAKE2b digest of a file's contents."""
+    h = hashlib.blake2b()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b""):
+            h.update(chunk)
+    return h.digest()
+
+# Backups run on one background thread so they overlap with conversion
+_BACKUP_POOL = ThreadPoolExecutor(max_workers=1)
+
+def _do_backup(output_path):
     """Backup existing .blob file to blob_backup/ with incrementing name.
+    The last number and backup name per base name are kept in a locked
+    blob_backup/.<base>.counter file, so BACKUP_DIR is never listed again.
     Silently skips if filesystem is read-only (cloud deploy)."""
     if not os.path.exists(output_path):
         return
     try:
         os.makedirs(BACKUP_DIR, exist_ok=True)
         base = os.path.splitext(os.path.basename(output_path))[0]
-        # Find next available backup number
-        existing = [f for f in os.listdir(BACKUP_DIR) if f.startswith(base + "_")]
-        next_num = len(existing) + 1
-        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-        backup_name = f"{base}_{next_num:03d}_{timestamp}.blob"
-        backup_path = os.path.join(BACKUP_DIR, backup_name)
-        shutil.copy2(output_path, backup_path)
+        counter_path = os.path.join(BACKUP_DIR, f".{base}.counter")
+        fd = os.open(counter_path, os.O_RDWR | os.O_CREAT, 0o666)
+        # Binary mode: a corrupt counter must not fail decoding, only the digit check
+        with os.fdopen(fd, "r+b") as counter:
+            if fcntl:
+                fcntl.flock(counter, fcntl.LOCK_EX)
+            last_num, _, latest_name = counter.read().partition(b"\n")
+            if last_num.isdigit():
+                next_num = int(last_num) + 1
+                latest = os.path.join(BACKUP_DIR, os.fsdecode(latest_name)) if latest_name else None
+            else:
+                # No (valid) counter yet: continue numbering from existing backups
+                existing = [os.path.join(BACKUP_DIR, f) for f in os.listdir(BACKUP_DIR) if f.startswith(base + "_")]
+                next_num = len(existing) + 1
+                latest = max(existing, key=os.path.getmtime) if existing else None
+            # Skip if the newest backup already holds the same bytes
+            if (latest is not None and os.path.exists(latest)
+                    and os.path.getsize(latest) == os.path.getsize(output_path)
+                    and file_digest(latest) == file_digest(output_path)):
+                print(f"Backup skipped: {output_path} matches blob_backup/{os.path.basename(latest)}")
+                return
+            timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+            backup_name = f"{base}_{next_num:03d}_{timestamp}.blob"
+            backup_path = os.path.join(BACKUP_DIR, backup_name)
+            shutil.copy2(output_path, backup_path)
+            counter.seek(0)
+            counter.write(os.fsencode(f"{next_num}\n{backup_name}"))
+            counter.truncate()
         print(f"Backed up: {output_path} -> blob_backup/{backup_name}")
     except OSError:
         pass  # Skip backup on read-only filesystems (cloud deploy)
 
+def backup_blob(output_path):
+    """Start backing up output_path in the background. Returns a Future;
+    call .result() on it before overwriting output_path."""
+    return _BACKUP_POOL.submit(_do_backup, output_path)
+
 def convert_image_to_ascii_bin(image_path, cols=100, rows=60, output_path="ascii_data.blob"):
+    # Backup existing blob in the background while the image is decoded
+    backup = backup_blob(output_path)
+
     # Open and convert to grayscale
-    img = Image.open(image_path).convert("L")
+    img = Image.open(image_path)
     print(f"Original image size: {img.width}x{img.height}")
+    # Let the JPEG decoder downscale by 1/2, 1/4 or 1/8 while decoding
+    # (no-op for other formats); keeps at least 2x the grid for LANCZOS
+    img.draft("L", (cols * 2, rows * 2))
+    img = img.convert("L")
 
     # Resize to ASCII grid resolution with high-quality downsampling
-    img = img.resize((cols, rows), Image.LANCZOS)
+    img = img.resize((cols, rows), Image.LANCZOS, reducing_gap=3.0)
     print(f"Resized to ASCII grid: {cols}x{rows}")
 
-    # Backup existing blob before overwriting
-    backup_blob(output_path)
+    # Backup must finish before the blob is overwritten
+    backup.result()
 
-    # Write binary file
+    # Write binary file in one call
     with open(output_path, "wb") as f:
         # Header: 2 bytes for cols, 2 bytes for rows (little-endian u16)
-        f.write(struct.pack("<HH", cols, rows))
         # Body: one byte per cell (brightness 0-255)
-        f.write(img.tobytes())
+        f.writelines((_HEADER.pack(cols, rows), img.tobytes()))
 
     total_size = 4 + cols * rows
     print(f"Wrote {cols}x{rows} = {cols * rows} brightness values to {output_path}")
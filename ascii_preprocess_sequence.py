@@ -33,32 +33,30 @@ Dependencies:
 import struct
 import sys
 import os
-import glob
+import mmap
+import queue
 import argparse
-import shutil
-from datetime import datetime
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
 from PIL import Image
 
-BACKUP_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "blob_backup")
+from ascii_preprocess import backup_blob
 
-def backup_blob(output_path):
-    """Backup existing .blob file to blob_backup/ with incrementing name.
-    Silently skips if filesystem is read-only (cloud deploy)."""
-    if not os.path.exists(output_path):
-        return
-    try:
-        os.makedirs(BACKUP_DIR, exist_ok=True)
-        base = os.path.splitext(os.path.basename(output_path))[0]
-        # Find next available backup number
-        existing = [f for f in os.listdir(BACKUP_DIR) if f.startswith(base + "_")]
-        next_num = len(existing) + 1
-        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-        backup_name = f"{base}_{next_num:03d}_{timestamp}.blob"
-        backup_path = os.path.join(BACKUP_DIR, backup_name)
-        shutil.copy2(output_path, backup_path)
-        print(f"Backed up: {output_path} -> blob_backup/{backup_name}")
-    except OSError:
-        pass  # Skip backup on read-only filesystems (cloud deploy)
+# 8-byte header: cols, rows, frameCount, fps (u16 LE)
+_HEADER = struct.Struct("<HHHH")
+
+# Blobs above this size are written with O_DIRECT on Linux (bypasses the
+# page cache); the buffer, chunks and offsets must be block-aligned
+DIRECT_IO_MIN_SIZE = 16 * 1024 * 1024
+_DIRECT_IO_ALIGN = 4096
+_DIRECT_IO_CHUNK = 1024 * 1024
+
+# Frames buffered between the decoder thread and the writer when streaming
+STREAM_QUEUE_SIZE = 16
+MAX_FRAMES = 65535  # frameCount is a u16
+PROGRESS_INTERVAL = 0.25  # Minimum seconds between progress lines
 
 # Try to import OpenCV for video support
 try:
@@ -68,8 +66,31 @@ except ImportError:
     HAS_CV2 = False
 
 
-def extract_frames_from_video(video_path, max_frames=None):
-    """Extract frames from a video/GIF file using OpenCV. Returns list of PIL Images."""
+def frame_to_grid(frame, cols, rows):
+    """Convert an OpenCV BGR frame straight to a grayscale (rows, cols) uint8
+    array, with no RGB/PIL round-trip."""
+    gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+    height, width = gray.shape
+    # INTER_AREA antialiases when shrinking (INTER_LANCZOS4 does not widen
+    # its kernel and would alias at ASCII grid sizes)
+    if cols <= width and rows <= height:
+        interpolation = cv2.INTER_AREA
+    else:
+        interpolation = cv2.INTER_LANCZOS4
+    return cv2.resize(gray, (cols, rows), interpolation=interpolation)
+
+
+def iter_frames_from_video(video_path, cols, rows, max_frames=None, fps=None, start_frame=0, end_frame=None):
+    """Open a video/GIF file with OpenCV. Returns (frame iterator, source fps).
+
+    Frames are decoded lazily, one at a time, as grayscale uint8 arrays
+    already resized to (rows, cols), so memory does not grow with video length.
+    If fps is lower than the source frame rate, frames are subsampled while
+    reading: skipped frames are only grab()bed, never decoded. fps=0 means the
+    source rate rounded to a whole number (as stored in the blob header);
+    None keeps every frame. start_frame and end_frame select a range of
+    source frame indices (end exclusive).
+    """
     if not HAS_CV2:
         print("ERROR: opencv-python is required for video/GIF input.")
         print("  Install it with: pip install opencv-python")
@@ -84,35 +105,70 @@ def extract_frames_from_video(video_path, max_frames=None):
     total_frames = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
     print(f"Video: {total_frames} frames at {source_fps:.1f} fps")
 
-    frames = []
-    count = 0
-    while True:
-        ret, frame = cap.read()
-        if not ret:
-            break
-        # Convert BGR (OpenCV) to RGB, then to PIL Image
-        rgb = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
-        pil_img = Image.fromarray(rgb)
-        frames.append(pil_img)
-        count += 1
-        if max_frames and count >= max_frames:
-            break
-
-    cap.release()
-    print(f"Extracted {len(frames)} frames from video")
-    return frames, source_fps
+    if fps is not None and fps <= 0:
+        fps = max(1, int(round(source_fps)))
+    # Source frames per output frame (1.0 = keep every frame)
+    step = source_fps / fps if fps and 0 < fps < source_fps else 1.0
+
+    def frames():
+        count = 0
+        retrieved = 0
+        # Retrieved frames wait here until the source is known to be long
+        # enough to keep them (at most two small grid frames)
+        pending = deque()
+        frame_idx = -1
+        try:
+            while not (max_frames and count >= max_frames):
+                # grab() advances without decoding; only retrieve() pays for it
+                if not cap.grab():
+                    break
+                frame_idx += 1
+                if frame_idx < start_frame:
+                    continue
+                if end_frame is not None and frame_idx >= end_frame:
+                    break
+                seen = frame_idx - start_frame + 1
+                if seen - 1 == int(retrieved * step):
+                    ret, frame = cap.retrieve()
+                    if not ret:
+                        break
+                    pending.append(frame_to_grid(frame, cols, rows))
+                    retrieved += 1
+                # Output frame k is kept once int(seen / step) > k: n source
+                # frames give int(n / step) output frames, dropping a partial step
+                while pending and int(seen / step) > count and not (max_frames and count >= max_frames):
+                    yield pending.popleft()
+                    count += 1
+        finally:
+            cap.release()
+        print(f"Extracted {count} frames from video")
+
+    return frames(), source_fps
+
+
+def extract_frames_from_video(video_path, cols, rows, max_frames=None, fps=None, start_frame=0, end_frame=None):
+    """Extract frames from a video/GIF file using OpenCV.
+    Returns list of grayscale uint8 arrays already resized to (rows, cols).
+    See iter_frames_from_video for the arguments."""
+    frames, source_fps = iter_frames_from_video(
+        video_path, cols, rows, max_frames, fps, start_frame, end_frame
+    )
+    return list(frames), source_fps
 
 
 def gather_frames_from_folder(folder_path):
-    """Gather image files from a folder, sorted by name. Returns list of PIL Images."""
-    extensions = ("*.png", "*.jpg", "*.jpeg", "*.bmp", "*.tiff")
-    files = []
-    for ext in extensions:
-        files.extend(glob.glob(os.path.join(folder_path, ext)))
-        files.extend(glob.glob(os.path.join(folder_path, ext.upper())))
-
-    # Remove duplicates and sort
-    files = sorted(set(files))
+    """Gather image files from a folder, sorted by name. Returns list of file paths.
+    Files are opened and decoded later, in parallel, by convert_sequence_to_blob."""
+    extensions = (".png", ".jpg", ".jpeg", ".bmp", ".tiff")
+    # One directory pass; hidden files are skipped as glob did
+    with os.scandir(folder_path) as entries:
+        files = [
+            entry.path for entry in entries
+            if not entry.name.startswith(".")
+            and os.path.splitext(entry.name)[1].lower() in extensions
+            and entry.is_file()
+        ]
+    files.sort()
 
     if not files:
         print(f"ERROR: No image files found in '{folder_path}'")
@@ -120,21 +176,174 @@ def gather_frames_from_folder(folder_path):
         sys.exit(1)
 
     print(f"Found {len(files)} image files in '{folder_path}'")
-    frames = []
-    for path in files:
-        frames.append(Image.open(path))
+    return files
+
+
+def use_direct_io(size):
+    """True if a blob of this size should be written with O_DIRECT."""
+    return sys.platform == "linux" and hasattr(os, "O_DIRECT") and size > DIRECT_IO_MIN_SIZE
+
+
+def write_direct(output_path, data, size):
+    """Write the first `size` bytes of a page-aligned buffer with O_DIRECT.
+    len(data) must be a multiple of the block size; the padding written past
+    `size` is truncated away afterwards."""
+    fd = os.open(output_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC | os.O_DIRECT, 0o666)
+    try:
+        offset = 0
+        while offset < len(data):
+            offset += os.write(fd, data[offset:offset + _DIRECT_IO_CHUNK])
+        os.ftruncate(fd, size)
+    finally:
+        os.close(fd)
+
+
+def frame_to_bytes(img, cols, rows):
+    """Grayscale, grid-sized bytes for one frame (image path, PIL Image or array)."""
+    if isinstance(img, (str, os.PathLike)):
+        # Opened here so the decode runs on the worker thread
+        with Image.open(img) as opened:
+            return frame_to_bytes(opened, cols, rows)
+    if not isinstance(img, Image.Image):
+        # Already grayscale at grid size (from extract_frames_from_video)
+        return img.tobytes()
+    # Convert to grayscale and resize (draft lets JPEG frames
+    # decode at reduced scale; no-op for other formats)
+    img.draft("L", (cols * 2, rows * 2))
+    gray = img.convert("L")
+    gray = gray.resize((cols, rows), Image.LANCZOS, reducing_gap=3.0)
+    return gray.tobytes()
+
+
+def progress_printer(total=None, quiet=False):
+    """Return report(count, final=False) printing "Processed" lines at most
+    every PROGRESS_INTERVAL seconds, plus the final count. quiet disables it."""
+    last_time = time.monotonic()
+    last_count = 0
+
+    def report(count, final=False):
+        nonlocal last_time, last_count
+        if quiet or (final and count == last_count):
+            return
+        now = time.monotonic()
+        if final or count == total or now - last_time >= PROGRESS_INTERVAL:
+            print(f"  Processed {count}/{total} frames" if total else f"  Processed {count} frames")
+            last_time = now
+            last_count = count
+
+    return report
+
+
+def print_summary(num_frames, cols, rows, fps, output_path):
+    actual_size = os.path.getsize(output_path)
+    print()
+    print(f"=== Done ===")
+    print(f"  Frames: {num_frames}")
+    print(f"  Grid:   {cols}x{rows} ({cols * rows} cells per frame)")
+    print(f"  FPS:    {fps}")
+    print(f"  Size:   {actual_size:,} bytes ({actual_size / 1024:.1f} KB)")
+    print(f"  Output: {output_path}")
 
-    return frames
 
+def stream_sequence_to_blob(frames, cols, rows, fps, output_path, quiet=False):
+    """Write frames from an iterator as they arrive. A decoder thread fills a
+    bounded queue while this thread writes, so only STREAM_QUEUE_SIZE frames
+    are held in memory. Frames go to a temp file next to output_path, which
+    replaces it only once every frame is written and frameCount is patched in.
+    Returns the number of frames written (0 leaves output_path untouched)."""
+    print(f"Streaming frames to {cols}x{rows} grid...")
+    print(f"Output: {output_path}")
+
+    report = progress_printer(quiet=quiet)
+    frame_queue = queue.Queue(maxsize=STREAM_QUEUE_SIZE)
+    stop = threading.Event()
+    done = object()
+
+    def produce():
+        try:
+            for i, img in enumerate(frames):
+                if stop.is_set():
+                    return
+                if i == MAX_FRAMES:
+                    print(f"WARNING: more than {MAX_FRAMES} frames exceeds u16 max. Truncating.")
+                    break
+                frame_queue.put(frame_to_bytes(img, cols, rows))
+        except Exception as e:
+            frame_queue.put(e)
+        finally:
+            # Release the source (e.g. VideoCapture) now if we stopped early
+            close = getattr(frames, "close", None)
+            if close:
+                close()
+            frame_queue.put(done)
+
+    def next_frame():
+        item = frame_queue.get()
+        if isinstance(item, Exception):
+            raise item
+        return item
+
+    producer = threading.Thread(target=produce, daemon=True)
+    producer.start()
+    num_frames = 0
+    tmp_path = output_path + ".tmp"
+    try:
+        data = next_frame()
+        if data is done:
+            return 0
+
+        # Backup existing blob in the background while frames are decoded
+        backup = backup_blob(output_path)
+        try:
+            with open(tmp_path, "wb") as f:
+                f.write(_HEADER.pack(cols, rows, 0, fps))
+                while data is not done:
+                    f.write(data)
+                    num_frames += 1
+                    report(num_frames)
+                    data = next_frame()
+                f.seek(0)
+                f.write(_HEADER.pack(cols, rows, num_frames, fps))
+            # Backup must finish before the blob is overwritten
+            backup.result()
+            os.replace(tmp_path, output_path)
+        except BaseException:
+            # Leave the previous blob in place on any failure
+            try:
+                os.remove(tmp_path)
+            except OSError:
+                pass
+            raise
+    finally:
+        # Unblock the producer if we stopped early (e.g. write error)
+        stop.set()
+        while producer.is_alive():
+            try:
+                frame_queue.get(timeout=0.1)
+            except queue.Empty:
+                pass
+
+    report(num_frames, final=True)
+    print_summary(num_frames, cols, rows, fps, output_path)
+    return num_frames
+
+
+def convert_sequence_to_blob(frames, cols=100, rows=60, fps=24, output_path="ascii_sequence.blob", quiet=False):
+    """Convert a list of frames to the animated ASCII blob format.
+    Frames are image file paths (from gather_frames_from_folder), PIL Images,
+    or grayscale arrays already resized to (rows, cols) as returned by
+    extract_frames_from_video. An iterator of frames (iter_frames_from_video)
+    is streamed to disk instead. quiet=True suppresses per-frame progress.
+    Returns the number of frames written."""
+    if not isinstance(frames, (list, tuple)):
+        return stream_sequence_to_blob(frames, cols, rows, fps, output_path, quiet=quiet)
 
-def convert_sequence_to_blob(frames, cols=100, rows=60, fps=24, output_path="ascii_sequence.blob"):
-    """Convert a list of PIL Images to the animated ASCII blob format."""
     num_frames = len(frames)
 
-    if num_frames > 65535:
-        print(f"WARNING: {num_frames} frames exceeds u16 max (65535). Truncating.")
-        frames = frames[:65535]
-        num_frames = 65535
+    if num_frames > MAX_FRAMES:
+        print(f"WARNING: {num_frames} frames exceeds u16 max ({MAX_FRAMES}). Truncating.")
+        frames = frames[:MAX_FRAMES]
+        num_frames = MAX_FRAMES
 
     frame_size = cols * rows
     total_size = 8 + frame_size * num_frames
@@ -143,30 +352,44 @@ def convert_sequence_to_blob(frames, cols=100, rows=60, fps=24, output_path="asc
     print(f"Output: {output_path}")
     print(f"Expected file size: {total_size:,} bytes ({total_size / 1024:.1f} KB)")
 
-    # Backup existing blob before overwriting
-    backup_blob(output_path)
-
-    with open(output_path, "wb") as f:
-        # 8-byte header
-        f.write(struct.pack("<HHHH", cols, rows, num_frames, fps))
+    # Backup existing blob in the background while frames are converted
+    backup = backup_blob(output_path)
 
-        for i, img in enumerate(frames):
-            # Convert to grayscale and resize
-            gray = img.convert("L")
-            gray = gray.resize((cols, rows), Image.LANCZOS)
-            f.write(gray.tobytes())
-
-            if (i + 1) % 10 == 0 or (i + 1) == num_frames:
-                print(f"  Processed {i + 1}/{num_frames} frames")
-
-    actual_size = os.path.getsize(output_path)
-    print()
-    print(f"=== Done ===")
-    print(f"  Frames: {num_frames}")
-    print(f"  Grid:   {cols}x{rows} ({frame_size} cells per frame)")
-    print(f"  FPS:    {fps}")
-    print(f"  Size:   {actual_size:,} bytes ({actual_size / 1024:.1f} KB)")
-    print(f"  Output: {output_path}")
+    # Assemble the whole blob in memory, then write it in one call
+    direct = use_direct_io(total_size)
+    if direct:
+        # Anonymous mmap is page-aligned, as O_DIRECT requires
+        aligned_size = -(-total_size // _DIRECT_IO_ALIGN) * _DIRECT_IO_ALIGN
+        buf = mmap.mmap(-1, aligned_size)
+    else:
+        buf = bytearray(total_size)
+    mv = memoryview(buf)
+    _HEADER.pack_into(buf, 0, cols, rows, num_frames, fps)
+
+    # Pillow releases the GIL while decoding/resizing, so frames are
+    # processed on all cores; map() still yields them in order
+    report = progress_printer(num_frames, quiet=quiet)
+    with ThreadPoolExecutor(max_workers=os.cpu_count()) as executor:
+        results = executor.map(frame_to_bytes, frames, [cols] * num_frames, [rows] * num_frames)
+        offset = 8
+        for i, data in enumerate(results):
+            mv[offset:offset + frame_size] = data
+            offset += frame_size
+            report(i + 1)
+
+    # Backup must finish before the blob is overwritten
+    backup.result()
+    if direct:
+        try:
+            write_direct(output_path, mv, total_size)
+        except OSError:
+            direct = False  # Filesystem without O_DIRECT support (e.g. tmpfs)
+    if not direct:
+        with open(output_path, "wb") as f:
+            f.write(mv[:total_size])
+
+    print_summary(num_frames, cols, rows, fps, output_path)
+    return num_frames
 
 
 def main():
@@ -201,7 +424,10 @@ def main():
         video_exts = (".mp4", ".mov", ".avi", ".mkv", ".webm", ".gif")
         if ext in video_exts:
             print(f"Input: video file '{input_path}'")
-            frames, source_fps = extract_frames_from_video(input_path, args.max_frames)
+            # Decoded lazily and streamed straight into the blob
+            frames, source_fps = iter_frames_from_video(
+                input_path, args.cols, args.rows, args.max_frames
+            )
             fps = args.fps if args.fps else max(1, int(round(source_fps)))
         else:
             print(f"ERROR: Unsupported file type '{ext}'")
@@ -211,10 +437,6 @@ def main():
         print(f"ERROR: '{input_path}' is not a valid file or folder")
         sys.exit(1)
 
-    if not frames:
-        print("ERROR: No frames to process")
-        sys.exit(1)
-
     # Ensure .blob extension
     output = args.output
     if not output.endswith(".blob"):
@@ -222,7 +444,9 @@ def main():
         output = base + ".blob"
         print(f"NOTE: Changed output extension to .blob (Rive requires .blob for import)")
 
-    convert_sequence_to_blob(frames, args.cols, args.rows, fps, output)
+    if not convert_sequence_to_blob(frames, args.cols, args.rows, fps, output):
+        print("ERROR: No frames to process")
+        sys.exit(1)
 
 
 if __name__ == "__main__":
@@ -9,12 +9,17 @@ Dependencies:
   pip install flask Pillow opencv-python
 """
 
+import io
 import os
 import sys
+import gzip
 import shutil
+import hashlib
 import tempfile
 import webbrowser
-from threading import Timer
+from collections import OrderedDict
+from threading import Lock, Timer
+import numpy as np
 from flask import Flask, render_template, request, send_file, jsonify
 from PIL import Image
 
@@ -24,16 +29,17 @@ sys.path.insert(0, SCRIPT_DIR)
 
 from ascii_preprocess import convert_image_to_ascii_bin
 from ascii_preprocess_sequence import (
-    extract_frames_from_video as _extract_frames_from_video,
+    iter_frames_from_video as _iter_frames_from_video,
+    frame_to_grid,
     convert_sequence_to_blob,
     HAS_CV2,
 )
 
 
-def extract_frames_from_video(video_path, max_frames=None):
+def iter_frames_from_video(video_path, cols, rows, **kwargs):
     """Wrapper that catches sys.exit from the original function."""
     try:
-        return _extract_frames_from_video(video_path, max_frames=max_frames)
+        return _iter_frames_from_video(video_path, cols, rows, **kwargs)
     except SystemExit as e:
         raise RuntimeError(f"Video extraction failed (exit code {e.code})")
 
@@ -45,6 +51,77 @@ VIDEO_EXTENSIONS = {".mp4", ".mov", ".avi", ".mkv", ".webm", ".gif"}
 
 ASCII_RAMP = ' .:-=+*#%@'
 
+# Brightness (0-255) -> ASCII_RAMP character code, built once
+_ASCII_LUT = np.frombuffer(ASCII_RAMP.encode("ascii"), dtype=np.uint8)[
+    np.arange(256) * (len(ASCII_RAMP) - 1) // 255
+]
+
+
+def pixels_to_ascii(pixels, cols, rows):
+    """Map a cols*rows grayscale byte buffer to newline-separated ASCII art."""
+    chars = np.empty((rows, cols + 1), dtype=np.uint8)
+    chars[:, :cols] = _ASCII_LUT[np.frombuffer(pixels, dtype=np.uint8).reshape(rows, cols)]
+    chars[:, cols] = ord("\n")
+    return chars.tobytes()[:-1].decode("ascii")
+
+
+# Decoded grayscale sources for /preview, keyed by SHA-1 of the upload, so
+# re-previewing the same image at another cols/rows only redoes the resize
+PREVIEW_CACHE_SIZE = 8
+PREVIEW_SOURCE_MAX = 1000  # Max cached width/height (2x the 500 grid cap)
+_preview_cache = OrderedDict()
+_preview_cache_lock = Lock()
+
+
+def load_preview_source(data):
+    """Decode uploaded image bytes to grayscale, reusing recent decodes."""
+    key = hashlib.sha1(data).digest()
+    with _preview_cache_lock:
+        img = _preview_cache.get(key)
+        if img is not None:
+            _preview_cache.move_to_end(key)
+            return img
+
+    img = Image.open(io.BytesIO(data))
+    # Grid is capped at 500x500, so nothing past 2x that is ever needed:
+    # JPEGs decode at reduced scale, other formats are shrunk before caching
+    img.draft("L", (PREVIEW_SOURCE_MAX, PREVIEW_SOURCE_MAX))
+    img = img.convert("L")
+    size = (min(img.width, PREVIEW_SOURCE_MAX), min(img.height, PREVIEW_SOURCE_MAX))
+    if size != img.size:
+        img = img.resize(size, Image.LANCZOS, reducing_gap=3.0)
+
+    with _preview_cache_lock:
+        _preview_cache[key] = img
+        while len(_preview_cache) > PREVIEW_CACHE_SIZE:
+            _preview_cache.popitem(last=False)
+    return img
+
+
+def send_blob(path, download_name):
+    """Send a converted blob as a download, gzip-encoded if the client accepts it."""
+    encoding = None
+    if request.accept_encodings["gzip"]:
+        gz_path = path + ".gz"
+        with open(path, "rb") as src, gzip.open(gz_path, "wb", compresslevel=1) as dst:
+            shutil.copyfileobj(src, dst, 1024 * 1024)
+        if os.path.getsize(gz_path) < os.path.getsize(path):
+            path, encoding = gz_path, "gzip"
+
+    response = send_file(
+        path,
+        as_attachment=True,
+        download_name=download_name,
+        mimetype="application/octet-stream",
+        conditional=False,
+        etag=False,
+    )
+    if encoding:
+        response.headers["Content-Encoding"] = encoding
+    response.vary.add("Accept-Encoding")
+    return response
+
+
 # Track temp dirs to clean up after response is sent
 _pending_cleanup = []
 
@@ -90,12 +167,7 @@ def convert_image():
 
         convert_image_to_ascii_bin(input_path, cols, rows, output_path)
 
-        return send_file(
-            output_path,
-            as_attachment=True,
-            download_name="ascii_data.blob",
-            mimetype="application/octet-stream",
-        )
+        return send_blob(output_path, "ascii_data.blob")
     except Exception as e:
         return jsonify(error=str(e)), 500
 
@@ -133,35 +205,29 @@ def convert_video():
         output_path = os.path.join(tmp_dir, "ascii_sequence.blob")
         file.save(input_path)
 
-        frames, source_fps = extract_frames_from_video(input_path)
-
-        if not frames:
-            return jsonify(error="No frames extracted from video"), 400
-
-        # Apply start/end frame range (indices are at source FPS)
+        # Start/end frame range (indices are at source FPS); frames outside
+        # the range and those dropped by FPS downsampling are never decoded
         start = max(0, start_frame)
-        end = end_frame if end_frame > 0 else len(frames)
-        end = min(end, len(frames))
-        if start < end:
-            frames = frames[start:end]
-        if not frames:
-            return jsonify(error="No frames in selected range"), 400
+        end = end_frame if end_frame > 0 else None
+        if end is not None and end <= start:
+            start, end = 0, None  # Invalid range: use the whole video
+        # fps <= 0 lets the iterator use the rounded source rate
+        frames, source_fps = iter_frames_from_video(
+            input_path, cols, rows, fps=fps, start_frame=start, end_frame=end
+        )
 
         actual_fps = fps if fps > 0 else max(1, int(round(source_fps)))
 
-        # Downsample if output FPS is lower than source FPS
-        if source_fps > 0 and actual_fps < source_fps:
-            step = source_fps / actual_fps
-            frames = [frames[int(i * step)] for i in range(int(len(frames) / step)) if int(i * step) < len(frames)]
-
-        convert_sequence_to_blob(frames, cols, rows, actual_fps, output_path)
+        # Frames are decoded and written one at a time, never all in memory
+        num_frames = convert_sequence_to_blob(frames, cols, rows, actual_fps, output_path, quiet=True)
+        if not num_frames and (start > 0 or end is not None):
+            # Range starts past the end of the video: use the whole video
+            frames, _ = iter_frames_from_video(input_path, cols, rows, fps=fps)
+            num_frames = convert_sequence_to_blob(frames, cols, rows, actual_fps, output_path, quiet=True)
+        if not num_frames:
+            return jsonify(error="No frames extracted from video"), 400
 
-        return send_file(
-            output_path,
-            as_attachment=True,
-            download_name="ascii_sequence.blob",
-            mimetype="application/octet-stream",
-        )
+        return send_blob(output_path, "ascii_sequence.blob")
     except Exception as e:
         return jsonify(error=str(e)), 500
 
@@ -182,20 +248,11 @@ def preview():
     rows = max(1, min(rows, 500))
 
     try:
-        img = Image.open(file.stream).convert("L")
+        img = load_preview_source(file.stream.read())
         img = img.resize((cols, rows), Image.LANCZOS)
         pixels = img.tobytes()
 
-        lines = []
-        for row in range(rows):
-            chars = []
-            for col in range(cols):
-                brightness = pixels[row * cols + col]
-                idx = brightness * (len(ASCII_RAMP) - 1) // 255
-                chars.append(ASCII_RAMP[idx])
-            lines.append("".join(chars))
-
-        return jsonify(preview="\n".join(lines), cols=cols, rows=rows)
+        return jsonify(preview=pixels_to_ascii(pixels, cols, rows), cols=cols, rows=rows)
     except Exception as e:
         return jsonify(error=str(e)), 500
 
@@ -264,32 +321,22 @@ def preview_video():
         input_path = os.path.join(tmp_dir, "input" + ext)
         file.save(input_path)
 
-        # Get metadata (fps and total frames) without decoding all frames
+        # One capture for metadata (fps and total frames) and the first frame
         import cv2
         cap = cv2.VideoCapture(input_path)
-        source_fps = cap.get(cv2.CAP_PROP_FPS)
-        total_frames = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
-        cap.release()
-
-        # Extract just the first frame for preview
-        frames, _ = extract_frames_from_video(input_path, max_frames=1)
-        if not frames:
+        try:
+            source_fps = cap.get(cv2.CAP_PROP_FPS)
+            total_frames = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
+            ret, frame = cap.read()
+        finally:
+            cap.release()
+        if not ret:
             return jsonify(error="Could not extract frames"), 400
 
-        img = frames[0].convert("L").resize((cols, rows), Image.LANCZOS)
-        pixels = img.tobytes()
-
-        lines = []
-        for row in range(rows):
-            chars = []
-            for col in range(cols):
-                brightness = pixels[row * cols + col]
-                idx = brightness * (len(ASCII_RAMP) - 1) // 255
-                chars.append(ASCII_RAMP[idx])
-            lines.append("".join(chars))
+        pixels = frame_to_grid(frame, cols, rows).tobytes()
 
         return jsonify(
-            preview="\n".join(lines),
+            preview=pixels_to_ascii(pixels, cols, rows),
             cols=cols,
             rows=rows,
             source_fps=round(source_fps, 1),